@@ -1,28 +1,53 @@
+import io
 import os
+import re
 import sys
 import json
+import itertools
+import zipfile
 import sqlite3
-import tempfile
 import hashlib
 import time
 import glob
+import queue
+import tempfile
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache, wraps
 import genanki
 import anthropic
 import httpx
+import orjson
 from dotenv import load_dotenv
-from flask import Flask, jsonify, send_file, request, after_this_request, Response, stream_with_context
+from flask import Flask, jsonify, send_file, request, Response, stream_with_context
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 from google.cloud import texttospeech
 from pypinyin import lazy_pinyin, Style
 
 load_dotenv()
 
+
+class OrjsonProvider(JSONProvider):
+    """Route jsonify() and request.get_json() through orjson."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 DATA_DIR = os.environ.get("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
 DB_PATH = os.path.join(DATA_DIR, "words.db")
 MEDIA_DIR = os.path.join(DATA_DIR, "media")
+os.makedirs(MEDIA_DIR, exist_ok=True)
 
 MODEL_ID = 1607392319
 
@@ -134,6 +159,16 @@ div {
 }
 """
 
+# Quoted strings are kept verbatim; no space is dropped before ":" ("a :hover")
+CSS_TOKEN = re.compile(r"""("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|\s*([{};,>])\s*|(:)\s+|\s+""")
+
+
+def minify_css(css):
+    return CSS_TOKEN.sub(lambda m: m.group(1) or m.group(2) or m.group(3) or " ", css).strip()
+
+
+CARD_CSS_MIN = minify_css(CARD_CSS)
+
 # Sentence block used in both templates (conditionally rendered)
 SENTENCE_BLOCK_FRONT = (
     "{{#SentenceSimplified}}"
@@ -246,83 +281,257 @@ ALL_TEMPLATES = {
 
 
 def build_model(template_ids=None):
-    if template_ids is None:
-        template_ids = list(ALL_TEMPLATES.keys())
-    templates = [ALL_TEMPLATES[tid] for tid in template_ids if tid in ALL_TEMPLATES]
-    if not templates:
-        templates = list(ALL_TEMPLATES.values())
+    if template_ids is not None:
+        template_ids = tuple(tid for tid in template_ids if tid in ALL_TEMPLATES)
+    return _build_model(template_ids or tuple(ALL_TEMPLATES))
+
+
+@lru_cache(maxsize=8)
+def _build_model(template_ids):
+    # genanki writes "ord" into these dicts, so each model gets its own copies
+    templates = [dict(ALL_TEMPLATES[tid]) for tid in template_ids]
     return genanki.Model(
         MODEL_ID,
         "HSK Vocabulary",
-        fields=HSK_FIELDS,
+        fields=[dict(f) for f in HSK_FIELDS],
         templates=templates,
-        css=CARD_CSS,
+        css=CARD_CSS_MIN,
     )
 
 DECK_ID = 2059400110
 
+SOUND_TAG = "[sound:{}]".format
+IMAGE_TAG = '<img src="{}">'.format
+
 
 def stable_guid(word_id: str, mode: str) -> str:
     """Generate a stable GUID from word_id and mode so reimport preserves progress."""
-    h = hashlib.sha256(f"{word_id}:{mode}".encode()).hexdigest()
-    return h[:10]
+    return hashlib.sha256(f"{word_id}:{mode}".encode()).digest()[:5].hex()
+
+
+media_reader = ThreadPoolExecutor(max_workers=8)
+MEDIA_READ_WINDOW = 32
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def write_package(pkg, file):
+    """Write a genanki Package as an .apkg, building the collection in memory."""
+    timestamp = time.time()
+    conn = sqlite3.connect(":memory:")
+    pkg.write_to_db(conn.cursor(), timestamp, itertools.count(int(timestamp * 1000)))
+    conn.commit()
+    collection = conn.serialize()
+    conn.close()
+
+    with zipfile.ZipFile(file, "w", compression=zipfile.ZIP_STORED) as outzip:
+        outzip.writestr("collection.anki2", collection, compress_type=zipfile.ZIP_DEFLATED)
+        outzip.writestr("media", json.dumps({idx: os.path.basename(path) for idx, path in enumerate(pkg.media_files)}))
+        media_files = pkg.media_files
+        for start in range(0, len(media_files), MEDIA_READ_WINDOW):
+            window = media_files[start:start + MEDIA_READ_WINDOW]
+            for idx, data in enumerate(media_reader.map(read_file, window), start):
+                outzip.writestr(str(idx), data)
 
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA mmap_size = 268435456")
     return conn
 
 
+DB_POOL_SIZE = 8
+db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+
+@contextmanager
+def db_connection():
+    """Lease a words.db connection from the pool, opening one if none is idle."""
+    try:
+        conn = db_pool.get_nowait()
+    except queue.Empty:
+        conn = get_db()
+    try:
+        yield conn
+    finally:
+        # Never hand the next lease an open transaction
+        conn.rollback()
+        try:
+            db_pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
 CLAUDE_MODEL = "claude-sonnet-4-20250514"
 BATCH_SIZE = 20
 TTS_VOICE = "cmn-CN-Wavenet-C"
 TTS_SPEAKING_RATE_WORD = 0.85
 TTS_SPEAKING_RATE_SENTENCE = 0.80
+TTS_SAMPLE_RATE_HERTZ = 22050
 SD_ENGINE = "sd3.5-medium"
+SD_ASPECT_RATIO = "5:4"
 
 
-def load_words():
-    conn = get_db()
-    rows = conn.execute(
-        "SELECT simplified, pinyin, meaning, hsk_level_v3 AS hsk_level FROM words WHERE hsk_level_v3 IS NOT NULL OR source = 'custom'"
-    ).fetchall()
-    conn.close()
+class RateLimiter:
+    """Thread-safe token bucket: bursts of up to `burst` calls, then `rate` per second."""
 
-    words = {}
-    for row in rows:
-        word_id = row["simplified"]
-        words[word_id] = {
-            "id": word_id,
-            "character": word_id,
-            "pinyin": row["pinyin"],
-            "meaning": row["meaning"],
-            "hsk_level": row["hsk_level"],
-        }
-    return words
-
-
-def load_word_index():
-    conn = get_db()
-    rows = conn.execute("SELECT * FROM word_cards").fetchall()
-    conn.close()
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0
+            self.tokens -= 1
+        if wait:
+            time.sleep(wait)
+
+
+# Buckets are per process; split the limits across gunicorn workers
+WORKER_PROCESSES = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+
+
+def provider_limit(rate, burst):
+    return RateLimiter(rate=rate / WORKER_PROCESSES, burst=max(1, burst // WORKER_PROCESSES))
+
+
+claude_limit = provider_limit(rate=50 / 60, burst=4)
+tts_limit = provider_limit(rate=15, burst=15)
+stability_limit = provider_limit(rate=10, burst=10)
+
+
+def db_version():
+    """Cheap change marker for words.db (and its WAL file)."""
+    stamps = []
+    for path in (DB_PATH, DB_PATH + "-wal"):
+        try:
+            st = os.stat(path)
+            stamps.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamps.append(None)
+    return tuple(stamps)
 
-    index = {}
-    for row in rows:
-        index[row["simplified"]] = {
-            "simplified": row["simplified"],
-            "pinyin": row["pinyin"] or "",
-            "meaning": row["meaning"] or "",
-            "partOfSpeech": row["part_of_speech"] or "",
-            "audio": row["audio"] or "",
-            "sentence": row["sentence"] or "",
-            "sentencePinyin": row["sentence_pinyin"] or "",
-            "sentenceMeaning": row["sentence_meaning"] or "",
-            "sentenceAudio": row["sentence_audio"] or "",
-            "sentenceImage": row["sentence_image"] or "",
-            "source": row["card_source"] or "",
-        }
-    return index
+
+def db_cached(loader):
+    """Cache a loader's result until words.db changes; returns (data, version)."""
+    lock = threading.Lock()
+    entry = {}
+
+    @wraps(loader)
+    def wrapper():
+        version = db_version()
+        with lock:
+            if entry.get("version") != version:
+                entry["data"] = loader()
+                entry["version"] = version
+            return entry["data"], entry["version"]
+
+    return wrapper
+
+
+last_export = {}
+EXPORT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+media_listing = (None, frozenset())
+
+
+def get_media_set():
+    global media_listing
+    try:
+        mtime = os.stat(MEDIA_DIR).st_mtime_ns
+    except FileNotFoundError:
+        return frozenset()
+    cached_mtime, names = media_listing
+    if cached_mtime != mtime:
+        names = frozenset(os.listdir(MEDIA_DIR))
+        media_listing = (mtime, names)
+    return names
+
+
+ExportNote = namedtuple("ExportNote", "id guid fields media")
+
+
+@db_cached
+def load_export_notes():
+    """Map word id to the ExportNote export_anki needs, formatted once per data change."""
+    with db_connection() as conn:
+        rows = conn.execute(
+            """SELECT w.simplified, w.pinyin, w.meaning, w.hsk_level_v3,
+                      COALESCE(c.part_of_speech, ''),
+                      COALESCE(c.audio, ''),
+                      COALESCE(c.sentence, ''),
+                      COALESCE(c.sentence_pinyin, ''),
+                      COALESCE(c.sentence_meaning, ''),
+                      COALESCE(c.sentence_audio, ''),
+                      COALESCE(c.sentence_image, '')
+               FROM words w
+               LEFT JOIN word_cards c ON c.simplified = w.simplified
+               WHERE w.hsk_level_v3 IS NOT NULL OR w.source = 'custom'"""
+        )
+
+        levels = {}
+        notes = {}
+        for (word_id, pinyin, meaning, hsk_level, part_of_speech, audio_file, sentence,
+             raw_pinyin, sentence_meaning, sen_audio_file, sen_image_file) in rows:
+            head, sep, tail = raw_pinyin.partition("Sandhi:")
+            sen_pinyin, sen_sandhi = (head.strip(), tail.strip()) if sep else (raw_pinyin, "")
+
+            if hsk_level not in levels:
+                levels[hsk_level] = sys.intern(str(hsk_level))
+
+            notes[word_id] = ExportNote(
+                id=word_id,
+                guid=stable_guid(word_id, "hsk"),
+                fields=(
+                    word_id,
+                    pinyin,
+                    meaning,
+                    levels[hsk_level],
+                    sys.intern(part_of_speech),
+                    SOUND_TAG(audio_file) if audio_file else "",
+                    sentence,
+                    sen_pinyin,
+                    sen_sandhi,
+                    sentence_meaning,
+                    SOUND_TAG(sen_audio_file) if sen_audio_file else "",
+                    IMAGE_TAG(sen_image_file) if sen_image_file else "",
+                ),
+                media=tuple(
+                    (f, os.path.join(MEDIA_DIR, f)) for f in (audio_file, sen_audio_file, sen_image_file) if f
+                ),
+            )
+    return notes
+
+
+def build_package(model, notes):
+    """Build the .apkg for notes and return its bytes."""
+    deck = genanki.Deck(DECK_ID, "HSK Vocabulary")
+    media_files = set()
+    existing_media = get_media_set()
+
+    for note in notes:
+        media_files.update(path for f_name, path in note.media if f_name in existing_media)
+
+        deck.add_note(genanki.Note(model=model, fields=list(note.fields), guid=note.guid))
+
+    pkg = genanki.Package(deck, media_files=list(media_files))
+    buf = io.BytesIO()
+    write_package(pkg, buf)
+    return buf.getvalue()
 
 
 @app.route("/export-anki", methods=["POST"])
@@ -332,77 +541,34 @@ def export_anki():
         template_ids = body.get("templates")
         tracked_ids = body.get("trackedWords", [])
 
-        model = build_model(template_ids)
-
-        all_words = load_words()
-        tracked_words = [all_words[wid] for wid in tracked_ids if wid in all_words]
+        all_notes, notes_version = load_export_notes()
+        tracked_notes = [n for n in map(all_notes.get, tracked_ids) if n is not None]
 
-        if not tracked_words:
+        if not tracked_notes:
             return jsonify({"error": "No tracked words to export"}), 400
 
-        word_index = load_word_index()
-        deck = genanki.Deck(DECK_ID, "HSK Vocabulary")
-        media_files = []
-
-        for word in tracked_words:
-            idx = word_index.get(word["character"], {})
-
-            audio = f'[sound:{idx["audio"]}]' if idx.get("audio") else ""
-            sen_audio = f'[sound:{idx["sentenceAudio"]}]' if idx.get("sentenceAudio") else ""
-            sen_image = f'<img src="{idx["sentenceImage"]}">' if idx.get("sentenceImage") else ""
-
-            # Collect media files
-            for f_name in [idx.get("audio"), idx.get("sentenceAudio"), idx.get("sentenceImage")]:
-                if f_name:
-                    f_path = os.path.join(MEDIA_DIR, f_name)
-                    if os.path.exists(f_path) and f_path not in media_files:
-                        media_files.append(f_path)
-
-            raw_pinyin = idx.get("sentencePinyin", "")
-            if "Sandhi:" in raw_pinyin:
-                parts = raw_pinyin.split("Sandhi:", 1)
-                sen_pinyin = parts[0].strip()
-                sen_sandhi = parts[1].strip()
-            else:
-                sen_pinyin = raw_pinyin
-                sen_sandhi = ""
-
-            note = genanki.Note(
-                model=model,
-                fields=[
-                    word["character"],
-                    word["pinyin"],
-                    word["meaning"],
-                    str(word["hsk_level"]),
-                    idx.get("partOfSpeech", ""),
-                    audio,
-                    idx.get("sentence", ""),
-                    sen_pinyin,
-                    sen_sandhi,
-                    idx.get("sentenceMeaning", ""),
-                    sen_audio,
-                    sen_image,
-                ],
-                guid=stable_guid(word["id"], "hsk"),
-            )
-            deck.add_note(note)
-
-        pkg = genanki.Package(deck)
-        pkg.media_files = media_files
-        tmp = tempfile.NamedTemporaryFile(suffix=".apkg", delete=False)
-        tmp.close()
-        pkg.write_to_file(tmp.name)
-
-        @after_this_request
-        def cleanup(response):
-            try:
-                os.remove(tmp.name)
-            except OSError:
-                pass
-            return response
+        model = build_model(template_ids)
+
+        media_mtime = os.stat(MEDIA_DIR).st_mtime_ns if os.path.isdir(MEDIA_DIR) else 0
+        sig = hashlib.blake2b(
+            orjson.dumps([
+                model.css,
+                [(t["name"], t["qfmt"], t["afmt"]) for t in model.templates],
+                [n.id for n in tracked_notes],
+                notes_version,
+                media_mtime,
+            ]),
+            digest_size=16,
+        ).hexdigest()
+        data = last_export.get(sig)
+        if data is None:
+            data = build_package(model, tracked_notes)
+            last_export.clear()
+            if len(data) <= EXPORT_CACHE_MAX_BYTES:
+                last_export[sig] = data
 
         return send_file(
-            tmp.name,
+            io.BytesIO(data),
             as_attachment=True,
             download_name="hsk-vocabulary.apkg",
             mimetype="application/octet-stream",
@@ -412,29 +578,75 @@ def export_anki():
         return jsonify({"error": str(e)}), 500
 
 
+@lru_cache(maxsize=4096)
 def get_sandhi_pinyin(text):
     syllables = lazy_pinyin(text, style=Style.TONE, tone_sandhi=True)
     return " ".join(syllables)
 
 
+@lru_cache(maxsize=4096)
 def get_dictionary_pinyin(text):
     syllables = lazy_pinyin(text, style=Style.TONE)
     return " ".join(syllables)
 
 
-def media_filename(word, suffix, ext):
-    h = hashlib.sha256(f"{word}:{suffix}".encode()).hexdigest()[:12]
+def media_filename(ext, *inputs):
+    """Name a generated media file after everything that determines its content."""
+    h = hashlib.sha256("|".join(map(str, inputs)).encode()).hexdigest()[:12]
     return f"gen_{h}.{ext}"
 
 
+def write_media(filename, generate):
+    """Write generate()'s bytes to MEDIA_DIR unless the file already exists."""
+    path = os.path.join(MEDIA_DIR, filename)
+    if os.path.exists(path):
+        return filename
+    data = generate()
+    if not data:
+        return ""
+    # Write to a unique temp name, then rename, so a partial file is never taken as cached
+    with tempfile.NamedTemporaryFile(dir=MEDIA_DIR, prefix=f"{filename}.", suffix=".tmp", delete=False) as f:
+        f.write(data)
+    os.replace(f.name, path)
+    return filename
+
+
+SENTENCES_TOOL = {
+    "name": "record_sentences",
+    "description": "Record the example sentence generated for each word.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "sentences": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "simplified": {"type": "string", "description": "The word, exactly as given"},
+                        "sentence": {"type": "string", "description": "The example sentence in simplified Chinese"},
+                        "sentenceMeaning": {"type": "string", "description": "English translation of the sentence"},
+                        "imagePrompt": {"type": "string", "description": "Short visual description for illustration"},
+                    },
+                    "required": ["simplified", "sentence", "sentenceMeaning", "imagePrompt"],
+                },
+            },
+        },
+        "required": ["sentences"],
+    },
+}
+
+
 def generate_sentences_batch(client, words):
     word_list = "\n".join(
         f"- {w['simplified']} ({w['pinyin']}): {w['meaning']}"
         for w in words
     )
+    claude_limit.acquire()
     response = client.messages.create(
         model=CLAUDE_MODEL,
         max_tokens=4096,
+        tools=[SENTENCES_TOOL],
+        tool_choice={"type": "tool", "name": SENTENCES_TOOL["name"]},
         messages=[{
             "role": "user",
             "content": f"""Generate one natural example sentence for each Chinese word below.
@@ -446,18 +658,21 @@ For each word, provide:
 2. sentenceMeaning: English translation of the sentence
 3. imagePrompt: A short visual description for illustration (10-20 words, no text/words in image). Focus on the WORD's core meaning rather than the sentence — e.g. for "tree" just show a tree, for "Arabic" show Arabic calligraphy or symbols, for "happy" show a smiling face. Keep it iconic and simple.
 
-Return ONLY a JSON array with objects having keys: simplified, sentence, sentenceMeaning, imagePrompt
+Record all of them with the {SENTENCES_TOOL["name"]} tool.
 
 Words:
 {word_list}"""
         }],
     )
-    text = response.content[0].text
-    if "```json" in text:
-        text = text.split("```json")[1].split("```")[0]
-    elif "```" in text:
-        text = text.split("```")[1].split("```")[0]
-    return json.loads(text.strip())
+    for block in response.content:
+        if block.type == "tool_use":
+            return block.input["sentences"]
+    raise ValueError(f"Claude did not call {SENTENCES_TOOL['name']} (stop reason: {response.stop_reason})")
+
+
+@lru_cache(maxsize=1)
+def get_tts_client():
+    return texttospeech.TextToSpeechClient()
 
 
 def generate_audio(tts_client, text, speaking_rate):
@@ -469,54 +684,137 @@ def generate_audio(tts_client, text, speaking_rate):
     audio_config = texttospeech.AudioConfig(
         audio_encoding=texttospeech.AudioEncoding.MP3,
         speaking_rate=speaking_rate,
+        sample_rate_hertz=TTS_SAMPLE_RATE_HERTZ,
     )
+    tts_limit.acquire()
     response = tts_client.synthesize_speech(
         input=synthesis_input, voice=voice, audio_config=audio_config
     )
     return response.audio_content
 
 
+stability_http = httpx.Client(
+    timeout=60.0,
+    transport=httpx.HTTPTransport(
+        retries=3,
+        limits=httpx.Limits(max_connections=8, max_keepalive_connections=8),
+    ),
+)
+
+
 def generate_image(api_key, prompt):
     url = "https://api.stability.ai/v2beta/stable-image/generate/sd3"
-    with httpx.Client(timeout=60.0) as client:
-        response = client.post(
-            url,
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Accept": "image/*",
-            },
-            files={"none": ""},
-            data={
-                "prompt": f"Simple flat illustration, clean modern style, no text or words: {prompt}",
-                "model": SD_ENGINE,
-                "output_format": "jpeg",
-                "aspect_ratio": "5:4",
-            },
-        )
-        if response.status_code == 200:
-            return response.content
-        else:
-            print(f"  Image generation failed ({response.status_code}): {response.text}", file=sys.stderr)
-            return None
-
-
-def upsert_word_card(conn, entry):
-    conn.execute(
-        """INSERT INTO word_cards (simplified, pinyin, meaning, part_of_speech, audio, sentence, sentence_pinyin, sentence_meaning, sentence_audio, sentence_image, card_source)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-           ON CONFLICT(simplified) DO UPDATE SET
-             pinyin=excluded.pinyin, meaning=excluded.meaning, part_of_speech=excluded.part_of_speech,
-             audio=excluded.audio, sentence=excluded.sentence, sentence_pinyin=excluded.sentence_pinyin,
-             sentence_meaning=excluded.sentence_meaning, sentence_audio=excluded.sentence_audio,
-             sentence_image=excluded.sentence_image, card_source=excluded.card_source""",
-        (
-            entry["simplified"], entry["pinyin"], entry["meaning"],
-            entry["partOfSpeech"], entry["audio"], entry["sentence"],
-            entry["sentencePinyin"], entry["sentenceMeaning"],
-            entry["sentenceAudio"], entry["sentenceImage"], entry["source"],
-        ),
+    stability_limit.acquire()
+    response = stability_http.post(
+        url,
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Accept": "image/*",
+        },
+        files={"none": ""},
+        data={
+            "prompt": f"Simple flat illustration, clean modern style, no text or words: {prompt}",
+            "model": SD_ENGINE,
+            "output_format": "jpeg",
+            "aspect_ratio": SD_ASPECT_RATIO,
+        },
     )
-    conn.commit()
+    if response.status_code == 200:
+        return response.content
+    else:
+        print(f"  Image generation failed ({response.status_code}): {response.text}", file=sys.stderr)
+        return None
+
+
+card_workers = ThreadPoolExecutor(max_workers=8)
+sentence_requests = ThreadPoolExecutor(max_workers=2)
+
+
+def generate_card(tts_client, stability_key, word, sent_data):
+    """Build one word's card row; returns (entry, None) or (None, error)."""
+    char = word["simplified"]
+    sentence = sent_data["sentence"]
+    sentence_meaning = sent_data["sentenceMeaning"]
+    image_prompt = sent_data["imagePrompt"]
+
+    sentence_pinyin_dict = get_dictionary_pinyin(sentence)
+    sentence_pinyin_sandhi = get_sandhi_pinyin(sentence)
+    if sentence_pinyin_dict:
+        sentence_pinyin_dict = sentence_pinyin_dict[0].upper() + sentence_pinyin_dict[1:]
+    if sentence_pinyin_sandhi:
+        sentence_pinyin_sandhi = sentence_pinyin_sandhi[0].upper() + sentence_pinyin_sandhi[1:]
+
+    if sentence_pinyin_dict != sentence_pinyin_sandhi:
+        sentence_pinyin = f"{sentence_pinyin_dict} Sandhi: {sentence_pinyin_sandhi}"
+    else:
+        sentence_pinyin = sentence_pinyin_dict
+
+    try:
+        word_audio_file = write_media(
+            media_filename("mp3", char, TTS_VOICE, TTS_SPEAKING_RATE_WORD, TTS_SAMPLE_RATE_HERTZ),
+            lambda: generate_audio(tts_client, char, TTS_SPEAKING_RATE_WORD),
+        )
+        sentence_audio_file = write_media(
+            media_filename("mp3", sentence, TTS_VOICE, TTS_SPEAKING_RATE_SENTENCE, TTS_SAMPLE_RATE_HERTZ),
+            lambda: generate_audio(tts_client, sentence, TTS_SPEAKING_RATE_SENTENCE),
+        )
+    except Exception as e:
+        return None, f"TTS error: {str(e)}"
+
+    image_file = ""
+    try:
+        image_file = write_media(
+            media_filename("jpg", image_prompt, SD_ENGINE, SD_ASPECT_RATIO),
+            lambda: generate_image(stability_key, image_prompt),
+        )
+    except Exception:
+        pass
+
+    entry = {
+        "simplified": char,
+        "pinyin": word.get("pinyin", ""),
+        "meaning": word.get("meaning", ""),
+        "partOfSpeech": word.get("partOfSpeech", ""),
+        "audio": word_audio_file,
+        "sentence": sentence,
+        "sentencePinyin": sentence_pinyin,
+        "sentenceMeaning": sentence_meaning,
+        "sentenceAudio": sentence_audio_file,
+        "sentenceImage": image_file,
+        "source": "generated",
+    }
+    return entry, None
+
+
+def upsert_word_cards(conn, entries):
+    """Upsert generated cards in a single transaction (one commit, one sync)."""
+    with conn:
+        conn.executemany(
+            """INSERT INTO word_cards (simplified, pinyin, meaning, part_of_speech, audio, sentence, sentence_pinyin, sentence_meaning, sentence_audio, sentence_image, card_source)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(simplified) DO UPDATE SET
+                 pinyin=excluded.pinyin, meaning=excluded.meaning, part_of_speech=excluded.part_of_speech,
+                 audio=excluded.audio, sentence=excluded.sentence, sentence_pinyin=excluded.sentence_pinyin,
+                 sentence_meaning=excluded.sentence_meaning, sentence_audio=excluded.sentence_audio,
+                 sentence_image=excluded.sentence_image, card_source=excluded.card_source""",
+            [
+                (
+                    entry["simplified"], entry["pinyin"], entry["meaning"],
+                    entry["partOfSpeech"], entry["audio"], entry["sentence"],
+                    entry["sentencePinyin"], entry["sentenceMeaning"],
+                    entry["sentenceAudio"], entry["sentenceImage"], entry["source"],
+                )
+                for entry in entries
+            ],
+        )
+
+
+def sse_event(data):
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+PROGRESS_EVERY = 5
+PROGRESS_INTERVAL = 0.25
 
 
 @app.route("/generate-cards", methods=["POST"])
@@ -534,93 +832,60 @@ def generate_cards():
         total = len(words)
         done = 0
         claude_client = anthropic.Anthropic()
-        tts_client = texttospeech.TextToSpeechClient()
+        tts_client = get_tts_client()
         stability_key = os.environ["STABILITY_API_KEY"]
-        conn = get_db()
-
-        try:
-            for batch_start in range(0, total, BATCH_SIZE):
-                batch = words[batch_start:batch_start + BATCH_SIZE]
-
+        last_progress = 0.0
+
+        def progress(char, **extra):
+            nonlocal last_progress
+            now = time.monotonic()
+            if not extra and done % PROGRESS_EVERY and done != total and now - last_progress < PROGRESS_INTERVAL:
+                return None
+            last_progress = now
+            return sse_event({"done": done, "total": total, "current": char, **extra})
+
+        with db_connection() as conn:
+            batches = [words[i:i + BATCH_SIZE] for i in range(0, total, BATCH_SIZE)]
+            next_sentences = sentence_requests.submit(generate_sentences_batch, claude_client, batches[0])
+            for batch_num, batch in enumerate(batches):
                 try:
-                    sentences = generate_sentences_batch(claude_client, batch)
+                    sentences = next_sentences.result()
                 except Exception as e:
-                    yield f"data: {json.dumps({'error': f'Claude API error: {str(e)}'})}\n\n"
+                    yield sse_event({"error": f"Claude API error: {str(e)}"})
                     return
+                if batch_num + 1 < len(batches):
+                    next_sentences = sentence_requests.submit(
+                        generate_sentences_batch, claude_client, batches[batch_num + 1]
+                    )
                 sentence_map = {s["simplified"]: s for s in sentences}
 
+                pending = {}
                 for word in batch:
                     char = word["simplified"]
                     sent_data = sentence_map.get(char)
                     if not sent_data:
                         done += 1
-                        yield f"data: {json.dumps({'done': done, 'total': total, 'current': char, 'skipped': True})}\n\n"
+                        yield progress(char, skipped=True)
                         continue
+                    pending[card_workers.submit(generate_card, tts_client, stability_key, word, sent_data)] = char
 
-                    sentence = sent_data["sentence"]
-                    sentence_meaning = sent_data["sentenceMeaning"]
-                    image_prompt = sent_data["imagePrompt"]
-
-                    sentence_pinyin_dict = get_dictionary_pinyin(sentence)
-                    sentence_pinyin_sandhi = get_sandhi_pinyin(sentence)
-                    if sentence_pinyin_dict:
-                        sentence_pinyin_dict = sentence_pinyin_dict[0].upper() + sentence_pinyin_dict[1:]
-                    if sentence_pinyin_sandhi:
-                        sentence_pinyin_sandhi = sentence_pinyin_sandhi[0].upper() + sentence_pinyin_sandhi[1:]
-
-                    if sentence_pinyin_dict != sentence_pinyin_sandhi:
-                        sentence_pinyin = f"{sentence_pinyin_dict} Sandhi: {sentence_pinyin_sandhi}"
-                    else:
-                        sentence_pinyin = sentence_pinyin_dict
-
-                    try:
-                        word_audio_bytes = generate_audio(tts_client, char, TTS_SPEAKING_RATE_WORD)
-                        sentence_audio_bytes = generate_audio(tts_client, sentence, TTS_SPEAKING_RATE_SENTENCE)
-                    except Exception as e:
+                entries = []
+                try:
+                    for future in as_completed(pending):
+                        char = pending[future]
+                        entry, error = future.result()
                         done += 1
-                        yield f"data: {json.dumps({'done': done, 'total': total, 'current': char, 'error': f'TTS error: {str(e)}'})}\n\n"
-                        continue
-
-                    word_audio_file = media_filename(char, "word", "mp3")
-                    sentence_audio_file = media_filename(char, "sentence", "mp3")
-                    os.makedirs(MEDIA_DIR, exist_ok=True)
-                    with open(os.path.join(MEDIA_DIR, word_audio_file), "wb") as f:
-                        f.write(word_audio_bytes)
-                    with open(os.path.join(MEDIA_DIR, sentence_audio_file), "wb") as f:
-                        f.write(sentence_audio_bytes)
-
-                    image_file = ""
-                    try:
-                        image_bytes = generate_image(stability_key, image_prompt)
-                        if image_bytes:
-                            image_file = media_filename(char, "image", "jpg")
-                            with open(os.path.join(MEDIA_DIR, image_file), "wb") as f:
-                                f.write(image_bytes)
-                    except Exception:
-                        pass
-
-                    entry = {
-                        "simplified": char,
-                        "pinyin": word.get("pinyin", ""),
-                        "meaning": word.get("meaning", ""),
-                        "partOfSpeech": word.get("partOfSpeech", ""),
-                        "audio": word_audio_file,
-                        "sentence": sentence,
-                        "sentencePinyin": sentence_pinyin,
-                        "sentenceMeaning": sentence_meaning,
-                        "sentenceAudio": sentence_audio_file,
-                        "sentenceImage": image_file,
-                        "source": "generated",
-                    }
-                    upsert_word_card(conn, entry)
-
-                    done += 1
-                    yield f"data: {json.dumps({'done': done, 'total': total, 'current': char})}\n\n"
-                    time.sleep(0.3)
-        finally:
-            conn.close()
-
-        yield f"data: {json.dumps({'complete': True, 'generated': done})}\n\n"
+                        if error:
+                            yield progress(char, error=error)
+                            continue
+                        entries.append(entry)
+                        event = progress(char)
+                        if event:
+                            yield event
+                finally:
+                    upsert_word_cards(conn, entries)
+
+        yield sse_event({"complete": True, "generated": done})
 
     return Response(
         stream_with_context(event_stream()),
@@ -638,4 +903,4 @@ def health():
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5001, debug=True)
+    app.run(host="0.0.0.0", port=5001, debug=os.environ.get("FLASK_DEBUG") == "1")
@@ -11,6 +11,7 @@ Usage:
     uv run generate.py --limit 10       # Generate only 10 words
     uv run generate.py --dry-run        # Show what would be generated
     uv run generate.py --word 爱国      # Generate a single word
+    uv run generate.py --batch-api      # Fetch all sentences via the Message Batches API
 
 Requires env vars:
     ANTHROPIC_API_KEY
@@ -19,11 +20,18 @@ Requires env vars:
 """
 
 import argparse
-import json
+import atexit
 import os
+import re
 import sys
 import time
+import random
 import hashlib
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -33,11 +41,14 @@ load_dotenv(Path(__file__).resolve().parent / ".env")
 
 import anthropic
 import httpx
+import orjson
+from google.api_core import exceptions as google_exceptions, retry as google_retry
 from google.cloud import texttospeech
 from pypinyin import lazy_pinyin, Style
 DATA_DIR = ROOT / "data"
 COMPLETE_PATH = DATA_DIR / "complete.json"
 INDEX_PATH = DATA_DIR / "word-index.json"
+PROGRESS_PATH = DATA_DIR / "word-index.jsonl"  # entries finished since the index was last saved
 MEDIA_DIR = DATA_DIR / "media"
 
 CLAUDE_MODEL = "claude-sonnet-4-20250514"
@@ -46,6 +57,57 @@ TTS_VOICE = "cmn-CN-Wavenet-C"  # female WaveNet voice
 TTS_SPEAKING_RATE_WORD = 0.85
 TTS_SPEAKING_RATE_SENTENCE = 0.80
 SD_ENGINE = "sd3.5-medium"
+MEDIA_WORKERS = 8  # words whose audio/images are generated at the same time
+CLAUDE_WORKERS = 5  # upcoming chunks whose Claude requests run ahead of media work
+BATCH_POLL_SECONDS = 30  # how often to check on a Message Batches API job
+MAX_ATTEMPTS = 6  # tries per API call before a transient error is fatal
+
+# TTS and image requests are network bound, so a batch's words are generated
+# concurrently rather than one after another
+media_workers = ThreadPoolExecutor(max_workers=MEDIA_WORKERS)
+# Claude requests for upcoming chunks, kept apart from media_workers so they
+# run ahead while earlier chunks' media is being generated
+claude_workers = ThreadPoolExecutor(max_workers=CLAUDE_WORKERS)
+
+
+class RateLimiter:
+    """Thread-safe token bucket: bursts of up to `burst` calls, then `rate` per second."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0
+            self.tokens -= 1
+        if wait:
+            time.sleep(wait)
+
+
+claude_limit = RateLimiter(rate=50 / 60, burst=4)  # requests per second
+tts_limit = RateLimiter(rate=15, burst=15)
+stability_limit = RateLimiter(rate=10, burst=10)
+
+# Rate limits and provider hiccups (429/503) are retried with jittered
+# exponential backoff rather than aborting a long run. The Anthropic SDK
+# does this itself (see max_retries), the TTS client takes a Retry policy,
+# and Stability is retried by hand in generate_image.
+TTS_RETRY = google_retry.Retry(
+    predicate=google_retry.if_exception_type(
+        google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable,
+    ),
+    initial=1.0, maximum=60.0, timeout=300.0,
+)
+
+# HSK 3.0 level tags in complete.json ("new-7" covers levels 7-9)
+NEW_LEVELS = {f"new-{i}": i for i in range(1, 8)}
 
 # Map abbreviated POS codes from complete.json to readable labels
 POS_MAP = {
@@ -68,28 +130,26 @@ POS_MAP = {
 
 def load_hsk_words() -> list[dict]:
     """Load HSK words from complete.json, return those with new-* levels."""
-    with open(COMPLETE_PATH, encoding="utf-8") as f:
-        raw = json.load(f)
+    with open(COMPLETE_PATH, "rb") as f:
+        raw = orjson.loads(f.read())
 
+    levels = NEW_LEVELS
+    pos_labels = {}  # few distinct POS combinations, so build each label once
     words = []
     for entry in raw:
-        new_level = None
-        for lv in entry.get("level", []):
-            if lv.startswith("new-"):
-                try:
-                    new_level = int(lv[4:])
-                except ValueError:
-                    continue
-                break
+        new_level = next((levels[lv] for lv in entry.get("level", ()) if lv in levels), None)
         if new_level is None:
             continue
 
-        form = entry["forms"][0] if entry.get("forms") else None
+        forms = entry.get("forms")
+        form = forms[0] if forms else None
         if not form:
             continue
 
-        pos_codes = entry.get("pos", [])
-        pos_label = ", ".join(POS_MAP.get(p, p) for p in pos_codes) if pos_codes else ""
+        pos_codes = tuple(entry.get("pos", ()))
+        pos_label = pos_labels.get(pos_codes)
+        if pos_label is None:
+            pos_label = pos_labels[pos_codes] = ", ".join(POS_MAP.get(p, p) for p in pos_codes)
 
         words.append({
             "simplified": entry["simplified"],
@@ -102,44 +162,79 @@ def load_hsk_words() -> list[dict]:
 
 
 def load_word_index() -> dict:
+    index = {}
     if INDEX_PATH.exists():
-        with open(INDEX_PATH, encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+        index = orjson.loads(INDEX_PATH.read_bytes())
+    # Pick up words finished by a run that stopped before saving the index
+    if PROGRESS_PATH.exists():
+        for line in PROGRESS_PATH.read_bytes().splitlines():
+            try:
+                entry = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue  # partially written line from a killed run
+            index[entry["simplified"]] = entry
+    return index
 
 
 def save_word_index(index: dict):
-    with open(INDEX_PATH, "w", encoding="utf-8") as f:
-        json.dump(index, f, ensure_ascii=False, indent=2)
-        f.write("\n")
+    # Same layout as json.dump(..., ensure_ascii=False, indent=2) plus a newline
+    INDEX_PATH.write_bytes(orjson.dumps(index, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+    # Everything in the progress log is part of the index now
+    PROGRESS_PATH.unlink(missing_ok=True)
+
+
+def record_progress(entry: dict):
+    """Append a finished entry to the progress log.
+
+    Rewriting the whole index after every word is quadratic over a long run,
+    so words are logged here as they finish and the index is saved once per
+    batch; load_word_index replays the log if a run is interrupted.
+    """
+    with open(PROGRESS_PATH, "ab") as f:
+        f.write(orjson.dumps(entry) + b"\n")
 
 
 def find_missing(hsk_words: list[dict], index: dict) -> list[dict]:
     """Find HSK words not in the word index."""
-    indexed = set(index.keys())
-    return [w for w in hsk_words if w["simplified"] not in indexed]
+    return [w for w in hsk_words if w["simplified"] not in index]
 
 
+THIRD_TONE_MARKS = frozenset("ǎěǐǒǔǚň")
+# First letter of the dictionary and sandhi readings in a sentencePinyin field
+PINYIN_PART_START = re.compile(r"(^| Sandhi: )(.)")
+
+
+@lru_cache(maxsize=4096)
 def get_sandhi_pinyin(text: str) -> str:
     """Get pinyin with tone sandhi applied using pypinyin."""
+    # pypinyin only changes tones around 一/不 and in runs of third tones, so
+    # any other text reads the same as its (cached) dictionary pinyin
+    if "一" not in text and "不" not in text:
+        dictionary = get_dictionary_pinyin(text)
+        syllables = dictionary.split(" ")
+        third = [not THIRD_TONE_MARKS.isdisjoint(s) for s in syllables]
+        if not any(a and b for a, b in zip(third, third[1:])):
+            return dictionary
+
     syllables = lazy_pinyin(text, style=Style.TONE, tone_sandhi=True)
     return " ".join(syllables)
 
 
+@lru_cache(maxsize=4096)
 def get_dictionary_pinyin(text: str) -> str:
     """Get pinyin with dictionary tones (no sandhi)."""
     syllables = lazy_pinyin(text, style=Style.TONE)
     return " ".join(syllables)
 
 
-def generate_sentences_batch(client: anthropic.Anthropic, words: list[dict]) -> list[dict]:
-    """Generate example sentences for a batch of words using Claude."""
+def sentences_request(words: list[dict]) -> dict:
+    """Claude request parameters for generating example sentences for a batch of words."""
     word_list = "\n".join(
         f"- {w['simplified']} ({w['pinyin']}): {w['meaning']}"
         for w in words
     )
 
-    response = client.messages.create(
+    return dict(
         model=CLAUDE_MODEL,
         max_tokens=4096,
         messages=[{
@@ -160,14 +255,61 @@ Words:
         }],
     )
 
-    text = response.content[0].text
+
+def parse_json_reply(text: str) -> list[dict]:
+    """Parse the JSON array in a Claude reply."""
     # Extract JSON from response (may be wrapped in ```json ... ```)
     if "```json" in text:
         text = text.split("```json")[1].split("```")[0]
     elif "```" in text:
         text = text.split("```")[1].split("```")[0]
 
-    return json.loads(text.strip())
+    return orjson.loads(text.strip())
+
+
+def generate_sentences_batch(client: anthropic.Anthropic, words: list[dict]) -> list[dict]:
+    """Generate example sentences for a batch of words using Claude."""
+    claude_limit.acquire()
+    response = client.messages.create(**sentences_request(words))
+    return parse_json_reply(response.content[0].text)
+
+
+def run_message_batch(client: anthropic.Anthropic, requests: list[dict]) -> list[str | None]:
+    """Run Claude requests through the Message Batches API.
+
+    Batched requests are billed at half price and aren't subject to the
+    per-minute rate limits, but results only come back once the whole batch
+    has ended (usually within minutes, at most 24 hours). Returns each
+    request's reply text in order, or None for requests that failed.
+    """
+    batch = client.messages.batches.create(
+        requests=[{"custom_id": f"chunk-{i}", "params": params} for i, params in enumerate(requests)],
+    )
+    print(f"Submitted message batch {batch.id} ({len(requests)} requests), waiting for results...")
+    while batch.processing_status != "ended":
+        time.sleep(BATCH_POLL_SECONDS)
+        batch = client.messages.batches.retrieve(batch.id)
+
+    replies: list[str | None] = [None] * len(requests)
+    for result in client.messages.batches.results(batch.id):
+        if result.result.type == "succeeded":
+            replies[int(result.custom_id.removeprefix("chunk-"))] = result.result.message.content[0].text
+        else:
+            print(f"  WARNING: batch request {result.custom_id} {result.result.type}", file=sys.stderr)
+    return replies
+
+
+def parse_batch_replies(replies: list[str | None]):
+    """Parse batch replies one chunk at a time, yielding [] for failed or malformed ones."""
+    for i, reply in enumerate(replies):
+        if not reply:
+            yield []
+            continue
+        try:
+            yield parse_json_reply(reply)
+        except orjson.JSONDecodeError as e:
+            print(f"  WARNING: batch request chunk-{i} returned invalid JSON: {e}", file=sys.stderr)
+            yield []
 
 
 def generate_audio(tts_client: texttospeech.TextToSpeechClient, text: str, speaking_rate: float) -> bytes:
@@ -181,18 +323,38 @@ def generate_audio(tts_client: texttospeech.TextToSpeechClient, text: str, speak
         audio_encoding=texttospeech.AudioEncoding.MP3,
         speaking_rate=speaking_rate,
     )
+    tts_limit.acquire()
     response = tts_client.synthesize_speech(
-        input=synthesis_input, voice=voice, audio_config=audio_config
+        input=synthesis_input, voice=voice, audio_config=audio_config, retry=TTS_RETRY
     )
     return response.audio_content
 
 
-def generate_image(api_key: str, prompt: str) -> bytes | None:
-    """Generate an image using Stability AI API."""
+# One keep-alive connection per media worker
+stability_http = httpx.Client(
+    timeout=60.0,
+    transport=httpx.HTTPTransport(
+        retries=3,
+        limits=httpx.Limits(max_connections=MEDIA_WORKERS, max_keepalive_connections=MEDIA_WORKERS),
+    ),
+)
+atexit.register(stability_http.close)
+
+
+def generate_image(api_key: str, prompt: str, out_path: Path) -> bool:
+    """Generate an image using Stability AI API, streaming it to out_path.
+
+    The JPEG is written through a temporary file as it downloads, so a
+    failed transfer never leaves a truncated image. Returns whether the
+    image was saved.
+    """
     url = f"https://api.stability.ai/v2beta/stable-image/generate/sd3"
+    part_path = out_path.with_name(out_path.name + ".part")
 
-    with httpx.Client(timeout=60.0) as client:
-        response = client.post(
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        stability_limit.acquire()
+        with stability_http.stream(
+            "POST",
             url,
             headers={
                 "Authorization": f"Bearer {api_key}",
@@ -205,28 +367,45 @@ def generate_image(api_key: str, prompt: str) -> bytes | None:
                 "output_format": "jpeg",
                 "aspect_ratio": "5:4",
             },
-        )
-        if response.status_code == 200:
-            return response.content
-        else:
-            print(f"  Image generation failed ({response.status_code}): {response.text}", file=sys.stderr)
-            return None
+        ) as response:
+            if response.status_code == 200:
+                try:
+                    with open(part_path, "wb") as f:
+                        for chunk in response.iter_bytes(65536):
+                            f.write(chunk)
+                except BaseException:
+                    part_path.unlink(missing_ok=True)
+                    raise
+                part_path.replace(out_path)
+                return True
+            # Error bodies are small JSON messages
+            response.read()
+
+        if attempt < MAX_ATTEMPTS and (response.status_code == 429 or response.status_code >= 500):
+            # Honor Retry-After when given, else full-jitter exponential backoff
+            retry_after = response.headers.get("Retry-After", "")
+            delay = float(retry_after) if retry_after.isdigit() else random.uniform(0, min(60, 2 ** attempt))
+            print(f"  Image generation got {response.status_code}, retrying in {delay:.1f}s", file=sys.stderr)
+            time.sleep(delay)
+            continue
+        print(f"  Image generation failed ({response.status_code}): {response.text}", file=sys.stderr)
+        return False
 
 
 def media_filename(word: str, suffix: str, ext: str) -> str:
     """Generate a deterministic filename for a media file."""
-    h = hashlib.sha256(f"{word}:{suffix}".encode()).hexdigest()[:12]
+    h = hashlib.blake2b(f"{word}:{suffix}".encode(), digest_size=6).hexdigest()
     return f"gen_{h}.{ext}"
 
 
-def generate_image_prompts(client: anthropic.Anthropic, entries: list[dict]) -> list[dict]:
-    """Generate image prompts for existing entries that are missing images."""
+def image_prompts_request(entries: list[dict]) -> dict:
+    """Claude request parameters for generating image prompts for existing entries."""
     word_list = "\n".join(
         f"- {e['simplified']}: {e['sentence']} ({e['sentenceMeaning']})"
         for e in entries
     )
 
-    response = client.messages.create(
+    return dict(
         model=CLAUDE_MODEL,
         max_tokens=4096,
         messages=[{
@@ -241,13 +420,59 @@ Words:
         }],
     )
 
-    text = response.content[0].text
-    if "```json" in text:
-        text = text.split("```json")[1].split("```")[0]
-    elif "```" in text:
-        text = text.split("```")[1].split("```")[0]
 
-    return json.loads(text.strip())
+def generate_image_prompts(client: anthropic.Anthropic, entries: list[dict]) -> list[dict]:
+    """Generate image prompts for existing entries that are missing images."""
+    claude_limit.acquire()
+    response = client.messages.create(**image_prompts_request(entries))
+    return parse_json_reply(response.content[0].text)
+
+
+def requested_ahead(request, client: anthropic.Anthropic, chunks: list[list[dict]]):
+    """Yield request(client, chunk) for each chunk, in order.
+
+    The next CLAUDE_WORKERS chunks' requests run on claude_workers while the
+    caller works on the current one. Only that many are ever submitted ahead,
+    so a failed or interrupted run wastes at most a few paid requests.
+    """
+    chunks = iter(chunks)
+    in_flight = deque(claude_workers.submit(request, client, chunk) for chunk in itertools.islice(chunks, CLAUDE_WORKERS))
+    while in_flight:
+        result = in_flight.popleft().result()
+        next_chunk = next(chunks, None)
+        if next_chunk is not None:
+            in_flight.append(claude_workers.submit(request, client, next_chunk))
+        yield result
+
+
+def shutdown_workers():
+    """Cancel queued Claude and media jobs so an aborted run stops making API calls."""
+    claude_workers.shutdown(cancel_futures=True)
+    media_workers.shutdown(cancel_futures=True)
+
+
+def completed_in_order(pending: dict):
+    """Yield (pending[future], result) for each future, in submission order.
+
+    If a job fails, jobs that haven't started yet are cancelled, but ones
+    already running are still waited for and yielded so their (paid-for)
+    media isn't dropped; the first error is raised once they're all done.
+    """
+    error = None
+    for future, key in pending.items():
+        try:
+            result = future.result()
+        except CancelledError:
+            continue
+        except Exception as e:
+            if error is None:
+                error = e
+                for other in pending:
+                    other.cancel()
+            continue
+        yield key, result
+    if error is not None:
+        raise error
 
 
 def process_missing_images(
@@ -255,12 +480,19 @@ def process_missing_images(
     index: dict,
     claude_client: anthropic.Anthropic,
     stability_key: str,
+    prompts: list[dict] | None = None,
 ):
-    """Generate images for index entries that have no sentenceImage."""
-    print(f"\nGenerating image prompts for {len(entries)} words...")
-    prompts = generate_image_prompts(claude_client, entries)
+    """Generate images for index entries that have no sentenceImage.
+
+    prompts holds Claude's image prompts if they were already fetched
+    (main requests them ahead of time); otherwise they're requested here.
+    """
+    if prompts is None:
+        print(f"\nGenerating image prompts for {len(entries)} words...")
+        prompts = generate_image_prompts(claude_client, entries)
     prompt_map = {p["simplified"]: p["imagePrompt"] for p in prompts}
 
+    pending = {}
     for entry in entries:
         char = entry["simplified"]
         image_prompt = prompt_map.get(char)
@@ -269,18 +501,82 @@ def process_missing_images(
             continue
 
         print(f"  {char}: generating image...")
-        image_bytes = generate_image(stability_key, image_prompt)
-        if image_bytes:
-            image_file = media_filename(char, "image", "jpg")
-            MEDIA_DIR.mkdir(parents=True, exist_ok=True)
-            (MEDIA_DIR / image_file).write_bytes(image_bytes)
-            index[char]["sentenceImage"] = image_file
-            save_word_index(index)
-            print(f"  {char}: done ✓")
-        else:
-            print(f"  {char}: image generation failed")
+        image_file = media_filename(char, "image", "jpg")
+        future = media_workers.submit(generate_image, stability_key, image_prompt, MEDIA_DIR / image_file)
+        pending[future] = (char, image_file)
+
+    try:
+        for (char, image_file), saved in completed_in_order(pending):
+            if saved:
+                index[char]["sentenceImage"] = image_file
+                record_progress(index[char])
+                print(f"  {char}: done ✓")
+            else:
+                print(f"  {char}: image generation failed")
+    finally:
+        save_word_index(index)
 
-        time.sleep(0.5)
+
+def generate_word_entry(
+    word: dict,
+    sent_data: dict,
+    tts_client: texttospeech.TextToSpeechClient,
+    stability_key: str,
+    skip_images: bool,
+) -> dict:
+    """Generate pinyin, audio, and image for one word; return its index entry."""
+    char = word["simplified"]
+    sentence = sent_data["sentence"]
+    sentence_meaning = sent_data["sentenceMeaning"]
+    image_prompt = sent_data["imagePrompt"]
+
+    # Generate pinyin with sandhi
+    sentence_pinyin_dict = get_dictionary_pinyin(sentence)
+    sentence_pinyin_sandhi = get_sandhi_pinyin(sentence)
+
+    # Capitalize first letter of sentence pinyin
+    sentence_pinyin_dict = sentence_pinyin_dict[0].upper() + sentence_pinyin_dict[1:] if sentence_pinyin_dict else sentence_pinyin_dict
+    sentence_pinyin_sandhi = sentence_pinyin_sandhi[0].upper() + sentence_pinyin_sandhi[1:] if sentence_pinyin_sandhi else sentence_pinyin_sandhi
+
+    # Build sentencePinyin field (with sandhi annotation if different)
+    if sentence_pinyin_dict != sentence_pinyin_sandhi:
+        sentence_pinyin = f"{sentence_pinyin_dict} Sandhi: {sentence_pinyin_sandhi}"
+    else:
+        sentence_pinyin = sentence_pinyin_dict
+
+    # Generate audio files
+    print(f"  {char}: generating audio...")
+    word_audio_bytes = generate_audio(tts_client, char, TTS_SPEAKING_RATE_WORD)
+    sentence_audio_bytes = generate_audio(tts_client, sentence, TTS_SPEAKING_RATE_SENTENCE)
+
+    word_audio_file = media_filename(char, "word", "mp3")
+    sentence_audio_file = media_filename(char, "sentence", "mp3")
+
+    (MEDIA_DIR / word_audio_file).write_bytes(word_audio_bytes)
+    (MEDIA_DIR / sentence_audio_file).write_bytes(sentence_audio_bytes)
+
+    # Generate image
+    image_file = ""
+    if not skip_images:
+        print(f"  {char}: generating image...")
+        image_file = media_filename(char, "image", "jpg")
+        if not generate_image(stability_key, image_prompt, MEDIA_DIR / image_file):
+            image_file = ""
+
+    # Use the word's pinyin from complete.json (more reliable than pypinyin for single words)
+    return {
+        "simplified": char,
+        "pinyin": word["pinyin"],
+        "meaning": word["meaning"],
+        "partOfSpeech": word.get("partOfSpeech", ""),
+        "audio": word_audio_file,
+        "sentence": sentence,
+        "sentencePinyin": sentence_pinyin,
+        "sentenceMeaning": sentence_meaning,
+        "sentenceAudio": sentence_audio_file,
+        "sentenceImage": image_file,
+        "source": "generated",
+    }
 
 
 def process_batch(
@@ -290,85 +586,43 @@ def process_batch(
     tts_client: texttospeech.TextToSpeechClient,
     stability_key: str,
     skip_images: bool = False,
+    sentences: list[dict] | None = None,
 ):
-    """Process a batch of words: generate sentences, audio, and images."""
-    print(f"\nGenerating sentences for {len(words)} words...")
-    sentences = generate_sentences_batch(claude_client, words)
+    """Process a batch of words: generate sentences, audio, and images.
+
+    sentences holds Claude's sentences for the batch if they were already
+    fetched (main requests them ahead of time); otherwise they're requested here.
+    """
+    if sentences is None:
+        print(f"\nGenerating sentences for {len(words)} words...")
+        sentences = generate_sentences_batch(claude_client, words)
 
     # Map by simplified character
     sentence_map = {s["simplified"]: s for s in sentences}
 
+    # Audio and images for the batch's words are generated side by side on
+    # media_workers; results are collected in word order so the index stays stable
+    pending = {}
     for word in words:
         char = word["simplified"]
         sent_data = sentence_map.get(char)
         if not sent_data:
             print(f"  WARNING: No sentence generated for {char}, skipping")
             continue
+        future = media_workers.submit(
+            generate_word_entry, word, sent_data, tts_client, stability_key, skip_images,
+        )
+        pending[future] = char
 
-        sentence = sent_data["sentence"]
-        sentence_meaning = sent_data["sentenceMeaning"]
-        image_prompt = sent_data["imagePrompt"]
-
-        # Generate pinyin with sandhi
-        sentence_pinyin_dict = get_dictionary_pinyin(sentence)
-        sentence_pinyin_sandhi = get_sandhi_pinyin(sentence)
-
-        # Capitalize first letter of sentence pinyin
-        sentence_pinyin_dict = sentence_pinyin_dict[0].upper() + sentence_pinyin_dict[1:] if sentence_pinyin_dict else sentence_pinyin_dict
-        sentence_pinyin_sandhi = sentence_pinyin_sandhi[0].upper() + sentence_pinyin_sandhi[1:] if sentence_pinyin_sandhi else sentence_pinyin_sandhi
-
-        # Build sentencePinyin field (with sandhi annotation if different)
-        if sentence_pinyin_dict != sentence_pinyin_sandhi:
-            sentence_pinyin = f"{sentence_pinyin_dict} Sandhi: {sentence_pinyin_sandhi}"
-        else:
-            sentence_pinyin = sentence_pinyin_dict
-
-        # Generate audio files
-        print(f"  {char}: generating audio...")
-        word_audio_bytes = generate_audio(tts_client, char, TTS_SPEAKING_RATE_WORD)
-        sentence_audio_bytes = generate_audio(tts_client, sentence, TTS_SPEAKING_RATE_SENTENCE)
-
-        word_audio_file = media_filename(char, "word", "mp3")
-        sentence_audio_file = media_filename(char, "sentence", "mp3")
+    try:
+        for char, entry in completed_in_order(pending):
+            index[char] = entry
 
-        MEDIA_DIR.mkdir(parents=True, exist_ok=True)
-        (MEDIA_DIR / word_audio_file).write_bytes(word_audio_bytes)
-        (MEDIA_DIR / sentence_audio_file).write_bytes(sentence_audio_bytes)
-
-        # Generate image
-        image_file = ""
-        if not skip_images:
-            print(f"  {char}: generating image...")
-            image_bytes = generate_image(stability_key, image_prompt)
-            if image_bytes:
-                image_file = media_filename(char, "image", "jpg")
-                (MEDIA_DIR / image_file).write_bytes(image_bytes)
-
-        # Use the word's pinyin from complete.json (more reliable than pypinyin for single words)
-        entry_pinyin = word["pinyin"]
-        part_of_speech = word.get("partOfSpeech", "")
-
-        # Update index
-        index[char] = {
-            "simplified": char,
-            "pinyin": entry_pinyin,
-            "meaning": word["meaning"],
-            "partOfSpeech": part_of_speech,
-            "audio": word_audio_file,
-            "sentence": sentence,
-            "sentencePinyin": sentence_pinyin,
-            "sentenceMeaning": sentence_meaning,
-            "sentenceAudio": sentence_audio_file,
-            "sentenceImage": image_file,
-            "source": "generated",
-        }
-
-        # Save after each word so progress isn't lost on failure
+            # Log each word so progress isn't lost on failure
+            record_progress(entry)
+            print(f"  {char}: done ✓")
+    finally:
         save_word_index(index)
-        print(f"  {char}: done ✓")
-
-        # Small delay to avoid rate limits
-        time.sleep(0.5)
 
 
 def main():
@@ -380,6 +634,7 @@ def main():
     parser.add_argument("--skip-images", action="store_true", help="Skip image generation")
     parser.add_argument("--generate-missing-images", action="store_true", help="Generate images for entries that have no sentenceImage")
     parser.add_argument("--fix-capitalization", action="store_true", help="Capitalize first letter of all sentencePinyin entries")
+    parser.add_argument("--batch-api", action="store_true", help="Request all sentences/image prompts up front via the Message Batches API (half price, results may take a while)")
     args = parser.parse_args()
 
     # Check env vars
@@ -397,6 +652,8 @@ def main():
 
     hsk_words = load_hsk_words()
     index = load_word_index()
+    if PROGRESS_PATH.exists() and not args.dry_run:
+        save_word_index(index)
 
     if args.fix_capitalization:
         fixed = 0
@@ -404,9 +661,7 @@ def main():
             sp = entry.get("sentencePinyin", "")
             if sp and sp[0].islower():
                 # Capitalize both dictionary and sandhi parts
-                parts = sp.split(" Sandhi: ")
-                parts = [p[0].upper() + p[1:] if p else p for p in parts]
-                entry["sentencePinyin"] = " Sandhi: ".join(parts)
+                entry["sentencePinyin"] = PINYIN_PART_START.sub(lambda m: m[1] + m[2].upper(), sp)
                 fixed += 1
         if fixed:
             save_word_index(index)
@@ -423,12 +678,25 @@ def main():
             print("All generated entries have images!")
             return
 
-        claude_client = anthropic.Anthropic()
+        claude_client = anthropic.Anthropic(max_retries=MAX_ATTEMPTS - 1)
         stability_key = os.environ.get("STABILITY_API_KEY", "")
+        MEDIA_DIR.mkdir(parents=True, exist_ok=True)
 
-        for i in range(0, len(entries_without_images), BATCH_SIZE):
-            batch = entries_without_images[i:i + BATCH_SIZE]
-            process_missing_images(batch, index, claude_client, stability_key)
+        chunks = [entries_without_images[i:i + BATCH_SIZE] for i in range(0, len(entries_without_images), BATCH_SIZE)]
+        if args.batch_api:
+            replies = run_message_batch(claude_client, [image_prompts_request(chunk) for chunk in chunks])
+            prompts_per_chunk = parse_batch_replies(replies)
+        else:
+            # Upcoming chunks' prompts are requested while earlier chunks'
+            # images are generated; each batch waits only for its own
+            print(f"\nGenerating image prompts for {len(entries_without_images)} words...")
+            prompts_per_chunk = requested_ahead(generate_image_prompts, claude_client, chunks)
+
+        try:
+            for batch, prompts in zip(chunks, prompts_per_chunk):
+                process_missing_images(batch, index, claude_client, stability_key, prompts=prompts)
+        finally:
+            shutdown_workers()
         return
 
     missing = find_missing(hsk_words, index)
@@ -468,23 +736,35 @@ def main():
         return
 
     # Initialize clients
-    claude_client = anthropic.Anthropic()
+    claude_client = anthropic.Anthropic(max_retries=MAX_ATTEMPTS - 1)
     tts_client = texttospeech.TextToSpeechClient()
     stability_key = os.environ.get("STABILITY_API_KEY", "")
+    MEDIA_DIR.mkdir(parents=True, exist_ok=True)
 
     # Process in batches
-    for i in range(0, len(missing), BATCH_SIZE):
-        batch = missing[i:i + BATCH_SIZE]
-        batch_num = i // BATCH_SIZE + 1
-        total_batches = (len(missing) + BATCH_SIZE - 1) // BATCH_SIZE
-        print(f"\n{'='*60}")
-        print(f"Batch {batch_num}/{total_batches}")
-        print(f"{'='*60}")
-
-        process_batch(
-            batch, index, claude_client, tts_client, stability_key,
-            skip_images=args.skip_images,
-        )
+    chunks = [missing[i:i + BATCH_SIZE] for i in range(0, len(missing), BATCH_SIZE)]
+    if args.batch_api:
+        replies = run_message_batch(claude_client, [sentences_request(chunk) for chunk in chunks])
+        sentences_per_chunk = parse_batch_replies(replies)
+    else:
+        # Upcoming chunks' sentences are requested while earlier chunks'
+        # media is generated; each batch waits only for its own
+        print(f"\nGenerating sentences for {len(missing)} words...")
+        sentences_per_chunk = requested_ahead(generate_sentences_batch, claude_client, chunks)
+
+    try:
+        for batch_num, (batch, sentences) in enumerate(zip(chunks, sentences_per_chunk), 1):
+            print(f"\n{'='*60}")
+            print(f"Batch {batch_num}/{len(chunks)}")
+            print(f"{'='*60}")
+
+            process_batch(
+                batch, index, claude_client, tts_client, stability_key,
+                skip_images=args.skip_images,
+                sentences=sentences,
+            )
+    finally:
+        shutdown_workers()
 
 
 if __name__ == "__main__":